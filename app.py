@@ -1,88 +1,562 @@
 import streamlit as st
 from dotenv import load_dotenv
 import google.generativeai as genai
+import pypdfium2 as pdfium
 import os
 import json
 import csv
-from io import StringIO
+import hashlib
+import math
+import queue
+import time
+import re
+import html
+import string
+import textwrap
+import shelve
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, TextIOWrapper
 
-# Load environment variables
-load_dotenv()
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEM_API"))
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # semantic cache is optional
+    SentenceTransformer = None
 
-# Initialize the model
-model = genai.GenerativeModel('gemini-1.5-flash')
+try:
+    import hnswlib
+except ImportError:  # without it the semantic cache stays in session state
+    hnswlib = None
 
-def generate_flashcards(content, subject=None, difficulty="Medium", answer_size="Medium", count=10):
-    """Generate flashcards using Gemini API"""
-    prompt = f"""
-    Generate {count} question-answer flashcards based on the following content.
-    The subject is: {subject if subject else 'general knowledge'}.
-    Difficulty level: {difficulty}.
-    Answer size: {answer_size} (keep answers concise if 'Short', more detailed if 'Long').
+# Cosine similarity above which a previous generation is reused for new content
+SEMANTIC_CACHE_THRESHOLD = 0.92
+
+# Requests above this many cards are split into concurrent sub-requests
+PARALLEL_THRESHOLD = 10
+PARALLEL_SHARDS = 3
+# Worker threads shared by all sessions for streaming Gemini requests
+GENERATION_WORKERS = 16
+
+# Line prefixes recognised by the streaming parser
+_Q_PREFIX = ('Q:', 'Question:')
+_A_PREFIX = ('A:', 'Answer:')
+
+# Content beyond this many (approximate) tokens is trimmed before prompting
+MAX_INPUT_TOKENS = 12000
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+_PROMPT_TMPL = string.Template(textwrap.dedent("""\
+    Generate $count question-answer flashcards based on the following content.
+    The subject is: $subject.
+    Difficulty level: $difficulty.
+    Answer size: $answer_size (keep answers concise if 'Short', more detailed if 'Long').
 
     For each flashcard:
     - Question should be clear and test understanding
     - Answer should be accurate and self-contained
-    - Format as "Q: [question]\nA: [answer]"
+    - Format as "Q: [question]
+      A: [answer]"$batch
 
     Content:
-    {content}
+    $content
+    """))
+
+EXPORT_MIME_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'anki': 'text/tab-separated-values',
+}
+
+# How long an exact-match generation stays cached, in seconds
+RESPONSE_CACHE_TTL = 24 * 3600
+# Least recently used generations are dropped beyond this many entries
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+# On-disk semantic cache: ANN index over content embeddings plus a payload shelf
+SEMANTIC_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+SEMANTIC_INDEX_MAX_ELEMENTS = 100000
+
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'app.css')
+
+@st.cache_resource
+def get_model():
+    """Configure Gemini once per process and return the shared model"""
+    # Load environment variables
+    load_dotenv()
+
+    # Configure Gemini API
+    genai.configure(api_key=os.getenv("GEM_API"))
+
+    return genai.GenerativeModel('gemini-1.5-flash')
+
+@st.cache_resource
+def _warm_model():
+    """Open the model's sync gRPC client in the background so the first generation skips the handshake
+
+    count_tokens and the streaming generate_content calls share that client.
     """
+    model = get_model()
+
+    def warm():
+        try:
+            model.count_tokens("ping")
+        except Exception:
+            pass  # warmup is best effort; real errors surface on generate
+
+    _generation_pool().submit(warm)
+    return True
+
+@st.cache_resource
+def _load_css():
+    """Read the app stylesheet once per process"""
+    with open(CSS_PATH, encoding='utf-8') as f:
+        return f"<style>{f.read()}</style>"
+
+@st.cache_resource
+def get_embedder():
+    """Load the local embedding model used by the semantic cache, if available"""
+    if SentenceTransformer is None:
+        return None
+    return SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+
+@st.cache_data(show_spinner=False, max_entries=16, ttl=3600)
+def extract_pdf_text(data):
+    """Extract the text of every page in a PDF; memoized on the file bytes"""
+    pdf = pdfium.PdfDocument(data)
+    try:
+        return '\n'.join(page.get_textpage().get_text_range() for page in pdf)
+    finally:
+        pdf.close()
+
+def approx_tokens(text):
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4
+
+def _smart_truncate(content, max_tokens):
+    """Cut `content` at the last sentence boundary within the token budget"""
+    limit = max_tokens * 4
+    end = 0
+    for match in _SENTENCE_END_RE.finditer(content, 0, limit + 1):
+        end = match.start()
+    # A single oversized first sentence still yields something to work with
+    return content[:end] if end else content[:limit]
+
+def build_prompt(content, subject, difficulty, answer_size, count, batch=''):
+    """Build the Gemini prompt for a single generation request"""
+    return _PROMPT_TMPL.substitute(
+        count=count,
+        subject=subject or 'general knowledge',
+        difficulty=difficulty,
+        answer_size=answer_size,
+        content=content,
+        batch=batch
+    )
+
+def build_shard_prompts(content, subject, difficulty, answer_size, count):
+    """Split a request into prompts that each ask for a distinct slice of the cards"""
+    shards = PARALLEL_SHARDS if count > PARALLEL_THRESHOLD else 1
+    if shards == 1:
+        return [build_prompt(content, subject, difficulty, answer_size, count)]
+
+    count_per = math.ceil(count / shards)
+    prompts = []
+    for i in range(shards):
+        first, last = i * count_per + 1, min((i + 1) * count_per, count)
+        batch = (
+            f"\n- This is batch {i + 1} of {shards}: write cards {first}-{last} of {count}, "
+            f"drawing on part {i + 1} of {shards} of the content, so batches do not overlap"
+        )
+        prompts.append(build_prompt(content, subject, difficulty, answer_size, last - first + 1, batch))
+    return prompts
+
+def _fp(question):
+    """Compact fingerprint of a normalized question, used to drop duplicate cards"""
+    return hashlib.blake2b(question.lower().strip().encode('utf-8', 'ignore'), digest_size=8).digest()
+
+class ResponseCache:
+    """Exact-match generation cache with a TTL and an LRU size cap"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for `key`, or None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] >= self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        """Store `value`, dropping expired entries and then the least recently used"""
+        now = time.time()
+        with self.lock:
+            self.entries[key] = (now, value)
+            self.entries.move_to_end(key)
+            for stale in [k for k, (stamp, _) in self.entries.items() if now - stamp >= self.ttl]:
+                del self.entries[stale]
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+@st.cache_resource
+def _response_cache():
+    """Process-wide exact-match cache: input key -> (flashcards, raw stream events)"""
+    return ResponseCache(RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES)
 
+@st.cache_resource
+def _generation_pool():
+    """Process-wide worker threads for streaming Gemini requests"""
+    return ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix='gemini')
+
+def _stream_shard(model, shard, prompt, events):
+    """Stream one request on a pool thread, posting (shard, text) chunks to `events`
+
+    A text of None marks the end of the shard, whether it finished or failed.
+    """
     try:
-        response = model.generate_content(prompt)
-        return parse_flashcards(response.text)
+        for chunk in model.generate_content(prompt, stream=True):
+            events.put((shard, chunk.text))
+    finally:
+        events.put((shard, None))
+
+def dedupe_cards(cards, count):
+    """Keep the first card for each normalized question, up to `count` cards"""
+    seen = set()
+    unique = []
+    for card in cards:
+        key = _fp(card['question'])
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(card)
+        if len(unique) >= count:
+            break
+    return unique
+
+def merge_shard_events(events, count, on_card=None):
+    """Parse interleaved (shard, text) stream chunks into at most `count` unique flashcards
+
+    A text of None ends that shard. `on_card` sees new cards in arrival order for the
+    live preview; the returned list is in shard order, so replaying the same events
+    (or a different arrival order) gives the same cards.
+    """
+    parsers = defaultdict(FlashcardStreamParser)
+    previewed = set()
+
+    for shard, text in events:
+        parser = parsers[shard]
+        if text is None:
+            parser.finish()
+        else:
+            parser.feed(text)
+        if on_card is None:
+            continue
+        for card in parser.drain():
+            key = _fp(card['question'])
+            if key in previewed or len(previewed) >= count:
+                continue
+            previewed.add(key)
+            on_card(card)
+
+    return dedupe_cards((card for shard in sorted(parsers) for card in parsers[shard].flashcards), count)
+
+def generate_sharded(content, subject, difficulty, answer_size, count, on_card=None):
+    """Generate flashcards, fanning large counts out over concurrent streaming requests
+
+    Parsing and `on_card` run on the calling (script) thread as chunks arrive.
+    Returns the merged flashcards and the raw stream events, for re-parsing later.
+    """
+    prompts = build_shard_prompts(content, subject, difficulty, answer_size, count)
+    model = get_model()
+    events = queue.Queue()
+    futures = [
+        _generation_pool().submit(_stream_shard, model, i, prompt, events)
+        for i, prompt in enumerate(prompts)
+    ]
+    received = []
+
+    def arrivals():
+        remaining = len(prompts)
+        while remaining:
+            event = events.get()
+            received.append(event)
+            if event[1] is None:
+                remaining -= 1
+            yield event
+
+    flashcards = merge_shard_events(arrivals(), count, on_card)
+    for future in futures:
+        future.result()  # re-raise any request failure
+    return flashcards, tuple(received)
+
+class SemanticIndex:
+    """Persistent HNSW index of content embeddings, with flashcards in a shelve sidecar"""
+
+    def __init__(self, directory, dim):
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, 'semantic.bin')
+        self.shelf_path = os.path.join(directory, 'semantic.db')
+        self.lock = threading.Lock()
+        self.index = hnswlib.Index(space='cosine', dim=dim)
+        if os.path.exists(self.index_path):
+            self.index.load_index(self.index_path, max_elements=SEMANTIC_INDEX_MAX_ELEMENTS)
+        else:
+            self.index.init_index(max_elements=SEMANTIC_INDEX_MAX_ELEMENTS, ef_construction=200, M=16)
+
+    def lookup(self, embedding, options, k=5):
+        """Return cached flashcards for the nearest matching content, or None"""
+        with self.lock:
+            k = min(k, self.index.get_current_count())
+            if not k:
+                return None
+            labels, distances = self.index.knn_query(embedding, k=k)
+            with shelve.open(self.shelf_path) as shelf:
+                for label, distance in zip(labels[0], distances[0]):
+                    if distance >= 1 - SEMANTIC_CACHE_THRESHOLD:
+                        break
+                    cached = shelf.get(str(label), {}).get(options)
+                    if cached is not None:
+                        return cached
+        return None
+
+    def add(self, content_key, embedding, options, flashcards):
+        """Store flashcards for `content_key`, reusing its index entry if present"""
+        with self.lock, shelve.open(self.shelf_path) as shelf:
+            label = shelf.get(f"hash:{content_key}")
+            if label is None:
+                if self.index.get_current_count() >= SEMANTIC_INDEX_MAX_ELEMENTS:
+                    return
+                label = self.index.get_current_count()
+                self.index.add_items(embedding.reshape(1, -1), [label])
+                self.index.save_index(self.index_path)
+                shelf[f"hash:{content_key}"] = label
+            payload = shelf.get(str(label), {})
+            payload[options] = flashcards
+            shelf[str(label)] = payload
+
+@st.cache_resource
+def get_semantic_index():
+    """Open the on-disk semantic index, if hnswlib and an embedder are available"""
+    embedder = get_embedder()
+    if hnswlib is None or embedder is None:
+        return None
+    return SemanticIndex(SEMANTIC_INDEX_DIR, embedder.get_sentence_embedding_dimension())
+
+def _semantic_lookup(content, options):
+    """Return (embedding, cached flashcards or None) for near-duplicate content"""
+    embedder = get_embedder()
+    if embedder is None:
+        return None, None
+
+    embedding = embedder.encode(content[:2000], normalize_embeddings=True)
+    index = get_semantic_index()
+    if index is not None:
+        return embedding, index.lookup(embedding, options)
+
+    best_score, best_value = 0.0, None
+    for cached_embedding, cached_options, value in st.session_state.get("_sem_cache", []):
+        if cached_options != options:
+            continue
+        score = float(embedding @ cached_embedding)
+        if score > best_score:
+            best_score, best_value = score, value
+
+    if best_score > SEMANTIC_CACHE_THRESHOLD:
+        return embedding, best_value
+    return embedding, None
+
+def _semantic_store(content_key, embedding, options, flashcards):
+    """Remember a generation for later near-duplicate lookups"""
+    index = get_semantic_index()
+    if index is not None:
+        index.add(content_key, embedding, options, flashcards)
+    else:
+        st.session_state.setdefault("_sem_cache", []).append((embedding, options, flashcards))
+
+def render_card_preview(cards, placeholder):
+    """Show the cards received so far while generation is still streaming"""
+    placeholder.markdown("\n\n".join(
+        f"**Card {i}:** {card['question']}" for i, card in enumerate(cards, 1)
+    ))
+
+def generate_flashcards(content, subject=None, difficulty="Medium", answer_size="Medium", count=10, placeholder=None):
+    """Generate flashcards using Gemini API, previewing cards in `placeholder` as they arrive"""
+    if approx_tokens(content) > MAX_INPUT_TOKENS:
+        content = _smart_truncate(content, MAX_INPUT_TOKENS)
+        st.info(f"Your content is long, so only the first ~{MAX_INPUT_TOKENS:,} tokens were used.")
+
+    options = (subject, difficulty, answer_size, count)
+    content_key = hashlib.blake2b(content.strip().encode('utf-8')).hexdigest()
+    cache = _response_cache()
+
+    cache_key = (content_key, *options)
+    entry = cache.get(cache_key)
+    if entry is not None:
+        _remember_raw(cache_key)
+        return entry[0]
+
+    received = []
+
+    def on_card(card):
+        received.append(card)
+        if placeholder is not None:
+            render_card_preview(received, placeholder)
+
+    try:
+        embedding, cached = _semantic_lookup(content, options)
+    except Exception as e:
+        # The semantic tier is an optional shortcut; fall through to a real generation
+        st.warning(f"Semantic cache unavailable: {e}")
+        embedding, cached = None, None
+    if cached is not None:
+        _remember_raw(None)
+        return cached
+
+    try:
+        flashcards, raw = generate_sharded(content, subject, difficulty, answer_size, count, on_card)
     except Exception as e:
+        _remember_raw(None)
         st.error(f"Error generating flashcards: {e}")
         return []
+    finally:
+        if placeholder is not None:
+            placeholder.empty()
 
-def parse_flashcards(text):
-    """Parse the generated text into flashcards"""
-    flashcards = []
-    current_q = None
-    
-    for line in text.split('\n'):
-        line = line.strip()
-        if line.startswith(('Q:', 'Question:')):
-            if current_q:
-                flashcards.append(current_q)
-            current_q = {'question': line[2:].strip(), 'answer': ''}
-        elif line.startswith(('A:', 'Answer:')):
-            if current_q:
-                current_q['answer'] = line[2:].strip()
-                flashcards.append(current_q)
-                current_q = None
-        elif current_q:
-            if current_q.get('answer', '') == '':
-                current_q['question'] += ' ' + line
-            else:
-                current_q['answer'] += ' ' + line
-    
-    if current_q:
-        flashcards.append(current_q)
-    
+    cache.put(cache_key, (flashcards, raw))
+    _remember_raw(cache_key)
+    if embedding is not None and flashcards:
+        try:
+            _semantic_store(content_key, embedding, options, flashcards)
+        except Exception as e:
+            # The cards are already generated; a failed cache write must not lose them
+            st.warning(f"Could not save to the semantic cache: {e}")
     return flashcards
 
+def _remember_raw(cache_key):
+    """Point this session at the response-cache entry holding the latest generation's raw events"""
+    if cache_key is None:
+        st.session_state.pop('_raw_key', None)
+    else:
+        st.session_state['_raw_key'] = cache_key
+
+def reparse_flashcards(count):
+    """Re-cut the latest raw response to `count` cards without an API call
+
+    Returns None once the response has left the cache. The parse is memoized
+    on (response, count) across reruns.
+    """
+    cache_key = st.session_state.get('_raw_key')
+    entry = _response_cache().get(cache_key) if cache_key else None
+    if entry is None:
+        return None
+    if st.session_state.get('_parsed_for') != (cache_key, count):
+        st.session_state['_parsed'] = merge_shard_events(entry[1], count)
+        st.session_state['_parsed_for'] = (cache_key, count)
+    return st.session_state['_parsed']
+
+class FlashcardStreamParser:
+    """Incrementally parse streamed model output into flashcards
+
+    Answers run until the next question, and questions that never get an
+    answer are dropped.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.q_parts = None
+        self.a_parts = None
+        self.flashcards = []
+        self._drained = 0
+
+    def feed(self, chunk):
+        """Consume a chunk of text, parsing every line it completes"""
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split('\n')
+        for line in map(str.strip, lines):
+            self._parse_line(line)
+
+    def drain(self):
+        """Return the cards completed since the last call"""
+        cards = self.flashcards[self._drained:]
+        self._drained = len(self.flashcards)
+        return cards
+
+    def finish(self):
+        """Flush any trailing partial line and return all parsed cards"""
+        if self.buffer:
+            self._parse_line(self.buffer.strip())
+            self.buffer = ''
+        self._close_card()
+        return self.flashcards
+
+    def _close_card(self):
+        if self.a_parts is not None:
+            self.flashcards.append({
+                'question': ' '.join(' '.join(self.q_parts).split()),
+                'answer': ' '.join(' '.join(self.a_parts).split()),
+            })
+        self.q_parts = None
+        self.a_parts = None
+
+    def _parse_line(self, line):
+        if line.startswith(_Q_PREFIX):
+            self._close_card()
+            self.q_parts = [line.split(':', 1)[1]]
+        elif self.q_parts is None:
+            return
+        elif self.a_parts is None:
+            if line.startswith(_A_PREFIX):
+                self.a_parts = [line.split(':', 1)[1]]
+            else:
+                self.q_parts.append(line)
+        else:
+            self.a_parts.append(line)
+
 def export_flashcards(flashcards, format='json'):
-    """Export flashcards in different formats"""
+    """Export flashcards in different formats, encoded as UTF-8 bytes"""
     if format == 'json':
-        return json.dumps(flashcards, indent=2)
+        if orjson is not None:
+            return orjson.dumps(flashcards, option=orjson.OPT_INDENT_2)
+        return json.dumps(flashcards, indent=2, ensure_ascii=False).encode('utf-8')
     elif format == 'csv':
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Question', 'Answer'])
-        for card in flashcards:
-            writer.writerow([card['question'], card['answer']])
+        output = BytesIO()
+        text = TextIOWrapper(output, encoding='utf-8', newline='', write_through=True)
+        writer = csv.writer(text)
+        writer.writerows([['Question', 'Answer'], *((card['question'], card['answer']) for card in flashcards)])
+        text.detach()
         return output.getvalue()
     elif format == 'anki':
-        output = StringIO()
-        for card in flashcards:
-            output.write(f"{card['question']}\t{card['answer']}\n")
-        return output.getvalue()
-    return ""
+        return ''.join(f"{card['question']}\t{card['answer']}\n" for card in flashcards).encode('utf-8')
+    return b""
+
+def render_cards_html(cards_tuple):
+    """Render flashcards as escaped HTML; model output never reaches the page unescaped"""
+    parts = ['<div class="cards">']
+    parts.extend(
+        f'<details class="flashcard"><summary>Card {i}: {html.escape(q)}</summary>'
+        f'<div class="flashcard-question">Answer:</div>{html.escape(a)}</details>'
+        for i, (q, a) in enumerate(cards_tuple, 1)
+    )
+    parts.append('</div>')
+    return ''.join(parts)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _export_cached(cards_tuple, fmt):
+    """Memoize exports so reruns don't re-serialize unchanged flashcards"""
+    return export_flashcards([{'question': q, 'answer': a} for q, a in cards_tuple], fmt)
 
 def main():
     st.set_page_config(
@@ -90,81 +564,10 @@ def main():
         layout="centered",
         initial_sidebar_state="collapsed"
     )
+    _warm_model()
     
     # Custom CSS for styling
-    st.markdown("""
-    <style>
-        .main {
-            max-width: 800px;
-            padding: 2rem;
-            background-color: #10E7DC;
-            border-radius: 15px;
-        }
-        
-        body {
-            background-color: #f0f2f6;
-        }
-        
-        .stApp {
-            background-color: #f0f2f6;
-        }
-
-        .stTextArea textarea {
-            background-color: white !important;
-            border: 1px solid #ddd !important;
-            border-radius: 8px !important;
-            padding: 10px !important;
-        }
-        
-        .stTextArea label {
-            font-weight: bold !important;
-            color: #333 !important;
-            margin-bottom: 8px !important;
-            display: block !important;
-        }
-
-        .stButton>button {
-            width: 100%;
-            background-color: #4CAF50;
-            color: white;
-            border-radius: 8px;
-            padding: 0.5rem 1rem;
-            font-weight: bold;
-        }
-        .stButton>button:hover {
-            background-color: #45a049;
-        }
-        .stTextArea>div>div>textarea {
-            min-height: 200px;
-        }
-        .flashcard {
-            background: white;
-            border-radius: 10px;
-            padding: 1rem;
-            margin: 0.5rem 0;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }
-        .flashcard-question {
-            font-weight: bold;
-            font-size: 1.1rem;
-            margin-bottom: 0.5rem;
-        }
-        .success-message {
-            color: #4CAF50;
-            font-weight: bold;
-            text-align: center;
-            margin: 1rem 0;
-        }
-        /* Prevent layout shifts */
-        .stSelectbox, .stDownloadButton {
-            margin-top: 0.5rem;
-        }
-        /* Hide the selectbox label properly */
-        [data-testid="stSelectbox"] label {
-            display: none;
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_load_css(), unsafe_allow_html=True)
     
     # Header
     st.markdown("<h1 style='text-align: center; color: white; background-color: #45a049; border-radius: 10px;'> LLM Powered Flashcard Generator</h1>", unsafe_allow_html=True)
@@ -189,10 +592,13 @@ def main():
     else:
         uploaded_file = st.file_uploader("Upload a file", type=['txt', 'pdf'], key="file_uploader")
         if uploaded_file:
-            if uploaded_file.type == 'text/plain':
-                content = uploaded_file.read().decode('utf-8')
+            if uploaded_file.type == 'application/pdf':
+                try:
+                    content = extract_pdf_text(uploaded_file.getvalue())
+                except pdfium.PdfiumError as e:
+                    st.error(f"Could not read PDF: {e}")
             else:
-                st.warning("PDF parsing would require additional libraries like PyPDF2")
+                content = uploaded_file.getvalue().decode('utf-8', 'replace')
     
     # Customization options
     st.markdown("### ⚙️ Customization Options")
@@ -238,17 +644,26 @@ def main():
                     subject=subject,
                     difficulty=difficulty,
                     answer_size=answer_size,
-                    count=flashcard_count
+                    count=flashcard_count,
+                    placeholder=st.empty()
                 )
+
+    if st.session_state.get('_raw_key') and st.button(
+        f"🔄 Re-cut last response to {flashcard_count} cards", key="reparse_button"
+    ):
+        reparsed = reparse_flashcards(flashcard_count)
+        if reparsed is None:
+            st.info("The last response is no longer cached; generate again.")
+        else:
+            st.session_state.flashcards = reparsed
     
     # Display flashcards if they exist
     if st.session_state.flashcards:
         st.markdown(f"<div class='success-message'>✅ Successfully generated {len(st.session_state.flashcards)} flashcards!</div>", unsafe_allow_html=True)
         
         st.markdown("### 📚 Generated Flashcards")
-        for i, card in enumerate(st.session_state.flashcards, 1):
-            with st.expander(f"Card {i}: {card['question']}", expanded=False):
-                st.markdown(f"<div class='flashcard'><div class='flashcard-question'>Question:</div>{card['question']}<br><br><div class='flashcard-question'>Answer:</div>{card['answer']}</div>", unsafe_allow_html=True)
+        cards_tuple = tuple((card['question'], card['answer']) for card in st.session_state.flashcards)
+        st.markdown(render_cards_html(cards_tuple), unsafe_allow_html=True)
         
         # Export section with persistent format selection
         st.markdown("### 💾 Export Options")
@@ -266,14 +681,14 @@ def main():
         
         with col2:
             # Generate the export data
-            export_data = export_flashcards(st.session_state.flashcards, export_format.lower())
+            export_data = _export_cached(cards_tuple, export_format.lower())
             
             # Create a unique key for the download button based on the format
             st.download_button(
                 label=f"Download as {export_format}",
                 data=export_data,
                 file_name=f"flashcards.{export_format.lower()}",
-                mime="text/plain" if export_format != 'json' else 'application/json',
+                mime=EXPORT_MIME_TYPES[export_format.lower()],
                 key=f"download_{export_format.lower()}"
             )
 
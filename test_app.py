@@ -0,0 +1,381 @@
+import csv
+import io
+import json
+import random
+import re
+import threading
+
+import numpy as np
+import pytest
+import streamlit as st
+
+import app
+
+
+class FakeEmbedder:
+    """Deterministic stand-in for SentenceTransformer: letter-frequency vectors"""
+
+    def encode(self, text, normalize_embeddings=False):
+        vec = np.zeros(26)
+        for ch in text.lower():
+            if 'a' <= ch <= 'z':
+                vec[ord(ch) - ord('a')] += 1
+        return vec / np.linalg.norm(vec) if normalize_embeddings else vec
+
+
+@pytest.fixture(autouse=True)
+def clean_session_state():
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    yield
+
+
+@pytest.fixture
+def session_semantic_cache(monkeypatch):
+    """sentence-transformers installed, hnswlib not: cache lives in session state"""
+    monkeypatch.setattr(app, 'get_embedder', lambda: FakeEmbedder())
+    monkeypatch.setattr(app, 'get_semantic_index', lambda: None)
+
+
+def test_semantic_store_falls_back_to_session_state(session_semantic_cache):
+    options = ('Biology', 'Medium', 'Medium', 10)
+    cards = [{'question': 'What is a cell?', 'answer': 'The basic unit of life.'}]
+
+    embedding, cached = app._semantic_lookup("Cells are the unit of life.", options)
+    assert cached is None
+
+    app._semantic_store('key', embedding, options, cards)
+
+    assert len(st.session_state["_sem_cache"]) == 1
+    _, cached = app._semantic_lookup("Cells are the unit of life.", options)
+    assert cached == cards
+
+
+def test_semantic_lookup_requires_matching_options(session_semantic_cache):
+    options = ('Biology', 'Medium', 'Medium', 10)
+    embedding, _ = app._semantic_lookup("Cells are the unit of life.", options)
+    app._semantic_store('key', embedding, options, [{'question': 'Q', 'answer': 'A'}])
+
+    _, cached = app._semantic_lookup("Cells are the unit of life.", ('Biology', 'Hard', 'Medium', 10))
+    assert cached is None
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Streams a canned response per prompt, split into small chunks"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        text = self.respond(prompt)
+        return [FakeChunk(text[i:i + 7]) for i in range(0, len(text), 7)]
+
+
+def test_generate_sharded_uses_distinct_prompts_and_merges(monkeypatch):
+    def respond(prompt):
+        batch = re.search(r'batch (\d)', prompt).group(1)
+        cards = [f"Q: Batch {batch} card {i}?\nA: Answer {i}." for i in range(10)]
+        return "\n".join(["Q: Shared question?\nA: Shared answer."] + cards)
+
+    model = FakeModel(respond)
+    monkeypatch.setattr(app, 'get_model', lambda: model)
+    previewed = []
+
+    cards, raw = app.generate_sharded("Some content.", "Bio", "Medium", "Medium", 30, previewed.append)
+
+    assert len(set(model.prompts)) == app.PARALLEL_SHARDS
+    assert len(cards) == 30
+    assert [c['question'] for c in cards].count("Shared question?") == 1
+    assert len(previewed) == 30
+    assert [c['question'] for c in cards[:11]] == ["Shared question?"] + [f"Batch 1 card {i}?" for i in range(10)]
+    assert "Batch 3 card 9?" in "".join(text for _, text in raw if text)
+
+
+def test_generate_sharded_propagates_request_errors(monkeypatch):
+    def respond(prompt):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(app, 'get_model', lambda: FakeModel(respond))
+
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        app.generate_sharded("Some content.", None, "Medium", "Medium", 5)
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = app.ResponseCache(ttl=60, max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_response_cache_drops_expired_entries_on_insert(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app.time, 'time', lambda: now[0])
+    cache = app.ResponseCache(ttl=60, max_entries=10)
+    cache.put('old', 1)
+
+    now[0] += 61
+    cache.put('new', 2)
+
+    assert 'old' not in cache.entries
+    assert cache.get('new') == 2
+
+
+def card(question, answer):
+    return {'question': question, 'answer': answer}
+
+
+PARSER_CASES = [
+    ("Q: What is a cell?\nA: The basic unit of life.",
+     [card('What is a cell?', 'The basic unit of life.')]),
+    ("Here are your cards:\n\nQ: One?\nA: First.\n\nQuestion: Two\ncontinued?\nAnswer: Second.",
+     [card('One?', 'First.'), card('Two continued?', 'Second.')]),
+    ("Q: X?\nA: X is a thing.\nIt continues here.\nQ: Y?\nA: Why not.",
+     [card('X?', 'X is a thing. It continues here.'), card('Y?', 'Why not.')]),
+    ("Q: orphan\nQ: Z?\nA: z",
+     [card('Z?', 'z')]),
+    ("Q: trailing orphan?\nA: fine\nQ: never answered",
+     [card('trailing orphan?', 'fine')]),
+    ("  Q:   spaced   out  \n   A:  lots   of   space  \r\n",
+     [card('spaced out', 'lots of space')]),
+    ("Q: empty answer\nA:\nQ: next\nA: ok",
+     [card('empty answer', ''), card('next', 'ok')]),
+    ("Q: first?\nA: a\nA: second answer line\nHope this helps!",
+     [card('first?', 'a A: second answer line Hope this helps!')]),
+    ("Q:\nWhat is on the next line?\nA:\nThe answer.\nQ: done?\nA: yes",
+     [card('What is on the next line?', 'The answer.'), card('done?', 'yes')]),
+]
+
+
+def parse_in_chunks(text, step):
+    parser = app.FlashcardStreamParser()
+    streamed = []
+    for i in range(0, len(text), step):
+        parser.feed(text[i:i + step])
+        streamed.extend(parser.drain())
+    parser.finish()
+    streamed.extend(parser.drain())
+    return streamed
+
+
+@pytest.mark.parametrize("text, expected", PARSER_CASES)
+def test_stream_parser(text, expected):
+    assert parse_in_chunks(text, 5) == expected
+
+
+def test_stream_parser_is_independent_of_chunk_boundaries():
+    rng = random.Random(0)
+    pieces = ["Q: q", "Question: qq", "A: a", "Answer: aa", "A:", "Q:", "text", "", "  x  y ", "Intro"]
+    for _ in range(500):
+        text = "\n".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        assert parse_in_chunks(text, rng.randint(1, 9)) == parse_in_chunks(text, len(text) + 1), text
+
+
+def test_extract_pdf_text_rejects_corrupt_files():
+    with pytest.raises(app.pdfium.PdfiumError):
+        app.extract_pdf_text(b"%PDF-1.4 not really a pdf")
+
+
+def test_smart_truncate_keeps_line_breaks_and_cuts_at_sentence_end():
+    content = "First sentence.\n\nSecond one!\nThird sentence is long. Fourth."
+    truncated = app._smart_truncate(content, max_tokens=10)
+
+    assert truncated == "First sentence.\n\nSecond one!"
+    assert content.startswith(truncated)
+
+
+def test_smart_truncate_falls_back_to_hard_cut():
+    assert app._smart_truncate("x" * 100, max_tokens=5) == "x" * 20
+
+
+def test_build_prompt_is_dedented():
+    prompt = app.build_prompt("Line one.\n    Indented line.", None, "Easy", "Short", 10)
+
+    assert prompt.startswith("Generate 10 question-answer flashcards")
+    assert '- Format as "Q: [question]\n  A: [answer]"\n' in prompt
+    assert prompt.rstrip().endswith("Content:\nLine one.\n    Indented line.")
+
+
+def test_warm_model_primes_the_client_used_for_generation(monkeypatch):
+    warmed = threading.Event()
+
+    class WarmableModel(FakeModel):
+        def count_tokens(self, contents):
+            warmed.set()
+
+    monkeypatch.setattr(app, 'get_model', lambda: WarmableModel(lambda prompt: ""))
+    app._warm_model.clear()
+
+    assert app._warm_model()
+    assert warmed.wait(timeout=5)
+
+
+def test_reparse_recuts_original_generation(monkeypatch):
+    def respond(prompt):
+        batch = re.search(r'batch (\d)', prompt).group(1)
+        return "\n".join(
+            f"Q: Batch {batch} card {i}?\nA: Answer {i}.\nMore detail {i}." for i in range(12)
+        )
+
+    monkeypatch.setattr(app, 'get_model', lambda: FakeModel(respond))
+    monkeypatch.setattr(app, 'get_embedder', lambda: None)
+    app._response_cache.clear()
+
+    cards = app.generate_flashcards("Some content.", count=25)
+
+    assert len(cards) == 25
+    assert app.reparse_flashcards(25) == cards
+    assert app.reparse_flashcards(10) == cards[:10]
+
+
+def test_failed_generation_forgets_previous_raw_response(monkeypatch):
+    monkeypatch.setattr(app, 'get_embedder', lambda: None)
+    app._response_cache.clear()
+    monkeypatch.setattr(app, 'get_model', lambda: FakeModel(lambda prompt: "Q: Old?\nA: Old."))
+    app.generate_flashcards("First content.", count=5)
+    assert app.reparse_flashcards(5) == [card('Old?', 'Old.')]
+
+    def fail(prompt):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(app, 'get_model', lambda: FakeModel(fail))
+
+    assert app.generate_flashcards("Second content.", count=5) == []
+    assert app.reparse_flashcards(5) is None
+
+
+def test_generate_flashcards_survives_semantic_lookup_failure(monkeypatch):
+    class BrokenEmbedder:
+        def encode(self, text, normalize_embeddings=False):
+            raise OSError("model download failed")
+
+    monkeypatch.setattr(app, 'get_model', lambda: FakeModel(lambda prompt: "Q: One?\nA: Yes."))
+    monkeypatch.setattr(app, 'get_embedder', lambda: BrokenEmbedder())
+    app._response_cache.clear()
+
+    assert app.generate_flashcards("Unrelated content.", count=5) == [{'question': 'One?', 'answer': 'Yes.'}]
+
+
+def test_merge_shard_events_returns_cards_in_shard_order():
+    events = [
+        (1, "Q: Second batch?\nA: b\n"),
+        (0, "Q: First batch?\nA: a\n"),
+        (1, None),
+        (0, "Q: Second batch?\nA: duplicate\n"),
+        (0, None),
+    ]
+    previewed = []
+
+    cards = app.merge_shard_events(events, 5, previewed.append)
+
+    assert [c['question'] for c in previewed] == ["Second batch?", "First batch?"]
+    assert cards == [
+        {'question': 'First batch?', 'answer': 'a'},
+        {'question': 'Second batch?', 'answer': 'duplicate'},
+    ]
+    assert app.merge_shard_events(events, 1) == cards[:1]
+
+
+def test_json_export_is_identical_with_and_without_orjson(monkeypatch):
+    pytest.importorskip('orjson')
+    cards = [card('Qu\'est-ce que "ça"?', 'Ünïcode — and a\ttab')]
+    with_orjson = app.export_flashcards(cards, 'json')
+
+    monkeypatch.setattr(app, 'orjson', None)
+
+    assert app.export_flashcards(cards, 'json') == with_orjson
+
+
+def test_semantic_index_round_trip_and_persistence(tmp_path):
+    pytest.importorskip('hnswlib')
+    embedder = FakeEmbedder()
+    options = ('Biology', 'Medium', 'Medium', 10)
+    cards = [card('What is a cell?', 'The basic unit of life.')]
+    embedding = embedder.encode("Cells are the unit of life.", normalize_embeddings=True)
+
+    index = app.SemanticIndex(str(tmp_path), 26)
+    assert index.lookup(embedding, options) is None
+    index.add('key', embedding, options, cards)
+    index.add('key', embedding, options, cards)
+
+    reopened = app.SemanticIndex(str(tmp_path), 26)
+    assert reopened.index.get_current_count() == 1
+    assert reopened.lookup(embedding, options) == cards
+    assert reopened.lookup(embedding, ('Biology', 'Hard', 'Medium', 10)) is None
+    far = embedder.encode("zzzz", normalize_embeddings=True)
+    assert reopened.lookup(far, options) is None
+
+
+def test_generate_flashcards_keeps_cards_when_semantic_store_fails(monkeypatch, session_semantic_cache):
+    def broken_store(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(app, 'get_model', lambda: FakeModel(lambda prompt: "Q: One?\nA: Yes."))
+    monkeypatch.setattr(app, '_semantic_store', broken_store)
+    app._response_cache.clear()
+
+    assert app.generate_flashcards("Stored content.", count=5) == [card('One?', 'Yes.')]
+
+
+def test_render_cards_html_escapes_model_output():
+    rendered = app.render_cards_html((("<script>alert(1)</script> & co?", 'Use "<b>" & <i>'),))
+
+    assert "<script>" not in rendered
+    assert "&lt;script&gt;alert(1)&lt;/script&gt; &amp; co?" in rendered
+    assert "Use &quot;&lt;b&gt;&quot; &amp; &lt;i&gt;" in rendered
+    assert rendered.count("<details") == 1
+
+
+EXPORT_CARDS = [
+    card('Qu\'est-ce que "ça"?', 'Ünïcode, with a comma'),
+    card('Tab\there?', 'Line one\nline two'),
+]
+
+
+def test_export_json_bytes():
+    data = app.export_flashcards(EXPORT_CARDS, 'json')
+
+    assert isinstance(data, bytes)
+    assert json.loads(data.decode('utf-8')) == EXPORT_CARDS
+    assert 'Ünïcode'.encode('utf-8') in data
+
+
+def test_export_csv_bytes():
+    data = app.export_flashcards(EXPORT_CARDS, 'csv')
+
+    assert isinstance(data, bytes)
+    rows = list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+    assert rows == [['Question', 'Answer'], *([c['question'], c['answer']] for c in EXPORT_CARDS)]
+    assert b'"Qu\'est-ce que ""\xc3\xa7a""?"' in data
+
+
+def test_export_anki_bytes():
+    data = app.export_flashcards([card('Ça?', 'Oui, "vraiment"')], 'anki')
+
+    assert data == 'Ça?\tOui, "vraiment"\n'.encode('utf-8')
+
+
+def test_export_unknown_format_is_empty():
+    assert app.export_flashcards(EXPORT_CARDS, 'xml') == b""
+
+
+def test_export_mime_types_cover_every_format():
+    assert app.EXPORT_MIME_TYPES == {
+        'json': 'application/json',
+        'csv': 'text/csv',
+        'anki': 'text/tab-separated-values',
+    }
+    for fmt in app.EXPORT_MIME_TYPES:
+        assert app.export_flashcards(EXPORT_CARDS, fmt)